@@ -4,6 +4,7 @@ class Agent:
     def __init__(self, agent_id, contract, storage=None):
         self.agent_id = agent_id
         self.contract = contract
+        self.storage = storage
 
     def register_recall_id(self, metadata="{}"):
         tx_hash = self.contract.register(self.agent_id, metadata)
@@ -20,7 +21,13 @@ class Agent:
     def send_message(self, to_agents, content):
         msg = {"from": self.agent_id, "to": to_agents, "content": content}
         self.storage["messages"].append(msg)
+        # Index by recipient at send time so reads don't scan every message
+        # (once per distinct recipient, as the old scan matched each message at most once)
+        inbox = self.storage.setdefault("inbox", {})
+        for a in dict.fromkeys(to_agents):
+            inbox.setdefault(a, []).append(msg)
         return {"sent": len(to_agents)}
 
     def check_new_messages(self):
-        return [m for m in self.storage["messages"] if self.agent_id in m["to"]]
+        # Copy: callers must not be able to mutate the index itself
+        return list(self.storage.get("inbox", {}).get(self.agent_id, ()))
@@ -1,59 +1,278 @@
 from web3 import Web3
-import json
-import statistics
+from hexbytes import HexBytes
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import OrderedDict
+from collections.abc import Mapping
+import aiohttp
+import asyncio
+import itertools
+import operator
+import orjson
+import requests
+import threading
+import time
+
+# keccak256("Registered(address,string,string,uint256)"), fixed by the contract interface
+_REGISTERED_TOPIC0 = bytes.fromhex("fb8d7ab03dae3913602adc8fb57461f20c5e5e018162e28664397baf430bbe55")
+if __debug__:
+    assert _REGISTERED_TOPIC0 == Web3.keccak(text="Registered(address,string,string,uint256)")
+
+# 4-byte selector of register(string,string)
+_REGISTER_SELECTOR = bytes(Web3.keccak(text="register(string,string)")[:4])
+
+# getEntry(address) selector and return type, used by the raw JSON-RPC read path
+_GET_ENTRY_SELECTOR = bytes(Web3.keccak(text="getEntry(address)")[:4])
+_ENTRY_TYPES = ["(address,string,string,uint256)"]
+
+# Owners per getEntry batch when streaming entries
+_ENTRY_BATCH = 100
+# getEntry calls in flight at once in get_all_entries_async
+_ASYNC_ENTRY_CONCURRENCY = 32
+
+# Fee estimates are reused for about half a block interval
+_FEE_CACHE_TTL = 6.0
+# Number of derived signer accounts kept per contract instance
+_SIGNER_CACHE_MAX = 64
+# Fee history: tip is the median over the last _FH_BLOCKS blocks at the 50th percentile.
+# Rewards are kept per block at a fixed percentile grid so later calls only fetch new blocks.
+_FH_BLOCKS = 10
+_FH_PERCENTILES = [10, 25, 50, 75, 90]
+_FH_MEDIAN = _FH_PERCENTILES.index(50)
+_FH_RETENTION = 1024
+
+# abi_path -> parsed ABI, shared by all instances built from the same artifact
+_ABI_CACHE = {}
+
+
+def _load_abi(abi_path):
+    abi = _ABI_CACHE.get(abi_path)
+    if abi is None:
+        # Hardhat artifacts also carry bytecode and metadata; parse once, keep only the ABI
+        with open(abi_path, "rb") as f:
+            artifact = orjson.loads(f.read())
+        abi = artifact["abi"] if isinstance(artifact, dict) and "abi" in artifact else artifact
+        _ABI_CACHE[abi_path] = abi
+    return abi
+
+
+def pooled_session(pool_connections=16, pool_maxsize=32, retries=Retry(total=2, backoff_factor=0.1)):
+    # Keep-alive connection pool so batched and repeated RPCs reuse TCP/TLS connections.
+    # retries is anything HTTPAdapter accepts as max_retries (an int or a urllib3 Retry)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def _median(values):
+    # Integer median of a small sample (the fee window is 10 blocks); None when empty
+    s = sorted(values)
+    n = len(s)
+    if not n:
+        return None
+    return s[n // 2] if n % 2 else (s[n // 2 - 1] + s[n // 2]) // 2
+
+
+def _encode_two_strings(a, b):
+    # ABI head/tail encoding of (string, string): two offsets, then length + right-padded bytes each
+    a_bytes = a.encode("utf-8")
+    b_bytes = b.encode("utf-8")
+    a_tail = len(a_bytes).to_bytes(32, "big") + a_bytes + b"\x00" * (-len(a_bytes) % 32)
+    b_tail = len(b_bytes).to_bytes(32, "big") + b_bytes + b"\x00" * (-len(b_bytes) % 32)
+    head = (0x40).to_bytes(32, "big") + (0x40 + len(a_tail)).to_bytes(32, "big")
+    return head + a_tail + b_tail
 
 class IdentityContract:
     def __init__(self, rpc_url, contract_address, abi_path="IdentityRegistry.json"):
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
-        with open(abi_path) as f:
-            artifact = json.load(f)
-        abi = artifact["abi"] if isinstance(artifact, dict) and "abi" in artifact else artifact
+        self.rpc_url = rpc_url
+        self._session = pooled_session()
+        self.w3 = Web3(Web3.HTTPProvider(rpc_url, session=self._session))
+        # Raw JSON-RPC ids shared by the sync and async clients
+        self._rpc_ids = itertools.count(1)
+        abi = _load_abi(abi_path)
         self.contract = self.w3.eth.contract(address=contract_address, abi=abi)
+        # Loop-invariant inputs of get_all_entries, computed once per instance
+        self._checksum_address = Web3.to_checksum_address(self.contract.address)
+        # Owners seen in Registered events up to _last_scanned_block (dict used as ordered set)
+        self._owners = {}
+        self._last_scanned_block = -1
+        self._owners_lock = threading.Lock()
+        # register() state that is stable across calls
+        self._chain_id = None
+        self._fee_cache = {"fields": None, "ts": 0.0}
+        self._presign_batch = hasattr(self.w3, "batch_requests")
+        # block number -> (base fee, rewards at _FH_PERCENTILES)
+        self._fh_ring = {}
+        # (newest block, base fee suggested for the block after it) from the last fee_history
+        self._fh_next_base = None
+        self._fh_lock = threading.Lock()
+        # private key bytes -> LocalAccount, least recently used first
+        self._signer_cache = OrderedDict()
+        self._signer_lock = threading.Lock()
+        # address -> next nonce to use
+        self._nonces = {}
+        self._nonce_lock = threading.Lock()
+        # Transaction templates, built once the chain id is known
+        self._tx_skel_legacy = None
+        self._tx_skel_1559 = None
+        # Accessor for SignedTransaction raw bytes, resolved on the first signed tx
+        self._raw_getter = None
+
+    def _rpc(self, method, params):
+        # Plain JSON-RPC over the pooled session, skipping web3's formatters and middleware
+        payload = orjson.dumps({"jsonrpc": "2.0", "id": next(self._rpc_ids), "method": method, "params": params})
+        resp = self._session.post(
+            self.rpc_url, data=payload, headers={"Content-Type": "application/json"}, timeout=30
+        )
+        resp.raise_for_status()
+        body = orjson.loads(resp.content)
+        if "error" in body:
+            raise RuntimeError(body["error"])
+        return body.get("result")
+
+    async def _arpc(self, session, method, params):
+        # Async counterpart of _rpc on the caller's aiohttp session
+        payload = orjson.dumps({"jsonrpc": "2.0", "id": next(self._rpc_ids), "method": method, "params": params})
+        async with session.post(self.rpc_url, data=payload, headers={"Content-Type": "application/json"}) as resp:
+            resp.raise_for_status()
+            body = orjson.loads(await resp.read())
+        if "error" in body:
+            raise RuntimeError(body["error"])
+        return body.get("result")
 
     def _raw_tx_bytes(self, signed):
-        # eth-account changed attribute name across versions
-        raw = getattr(signed, "rawTransaction", None)
-        if raw is None:
-            raw = getattr(signed, "raw_transaction", None)
-        if raw is None:
+        if self._raw_getter is not None:
+            return self._raw_getter(signed)
+        # eth-account changed attribute name across versions; probe once, then reuse the accessor
+        for getter in (
+            operator.attrgetter("raw_transaction"),
+            operator.attrgetter("rawTransaction"),
             # Some versions expose .rawTransaction as bytes-like mapping
+            operator.itemgetter("rawTransaction"),
+        ):
             try:
-                raw = signed["rawTransaction"]  # type: ignore[index]
+                raw = getter(signed)
             except Exception:
-                pass
-        if raw is None:
-            raise AttributeError("SignedTransaction missing raw transaction bytes")
-        return raw
+                continue
+            if raw is not None:
+                self._raw_getter = getter
+                return raw
+        raise AttributeError("SignedTransaction missing raw transaction bytes")
+
+    def _signer(self, private_key):
+        # Deriving the account runs a secp256k1 public key multiplication; reuse it per key
+        if isinstance(private_key, str):
+            key_bytes = bytes.fromhex(private_key.removeprefix("0x"))
+        else:
+            key_bytes = bytes(private_key)
+        with self._signer_lock:
+            acct = self._signer_cache.get(key_bytes)
+            if acct is not None:
+                self._signer_cache.move_to_end(key_bytes)
+                return acct
+        acct = self.w3.eth.account.from_key(key_bytes)
+        with self._signer_lock:
+            self._signer_cache[key_bytes] = acct
+            if len(self._signer_cache) > _SIGNER_CACHE_MAX:
+                self._signer_cache.popitem(last=False)
+        return acct
 
     def register(self, agent_id, metadata, private_key):
         if not private_key:
             raise ValueError("private_key is required to sign the transaction")
         # Use the provided key as the signer so msg.sender == agent address
-        local_account = self.w3.eth.account.from_key(private_key)
-        chain_id = self.w3.eth.chain_id
-        latest_block = self.w3.eth.get_block("latest")
-        eip1559_supported = isinstance(latest_block, dict) and ("baseFeePerGas" in latest_block)
+        local_account = self._signer(private_key)
+        address = local_account.address
+        fetched_nonce, latest_block, fh = self._presign_reads(address)
+        fee_fields = self._fee_fields(latest_block, fh)
+        if self._tx_skel_1559 is None:
+            # Fields fixed for this contract and chain; per call only sender, nonce, data and fees change
+            base = {"to": self._checksum_address, "value": 0, "gas": 1000000, "chainId": self._chain_id}
+            self._tx_skel_legacy = base
+            self._tx_skel_1559 = {**base, "type": 2}
+        skel = self._tx_skel_legacy if "gasPrice" in fee_fields else self._tx_skel_1559
+        # register(string,string) has a fixed shape, so build the tx without web3's ContractFunction
+        data = _REGISTER_SELECTOR + _encode_two_strings(agent_id, metadata)
+        # Reserve the nonce only once everything else is ready, so a failed fee read can't burn one
+        nonce = self._reserve_nonce(address, fetched_nonce)
+        try:
+            tx = {**skel, "from": address, "nonce": nonce, "data": data, **fee_fields}
+            signed = local_account.sign_transaction(tx)
+            raw = self._raw_tx_bytes(signed)
+            tx_hash = HexBytes(self._rpc("eth_sendRawTransaction", ["0x" + bytes(raw).hex()]))
+        except Exception:
+            # The reserved nonce may be unused or the counter off (nonce too low/high,
+            # already known); drop it so the next call resyncs from the node
+            with self._nonce_lock:
+                self._nonces.pop(address, None)
+            raise
+        return tx_hash.hex()
+
+    def _reserve_nonce(self, address, fetched=None):
+        # Hand out nonces from a local per-address counter; the node is only asked for
+        # the transaction count the first time an address signs (or after a failure)
+        with self._nonce_lock:
+            nonce = self._nonces.get(address)
+            if nonce is None:
+                nonce = fetched if fetched is not None else self.w3.eth.get_transaction_count(address)
+            self._nonces[address] = nonce + 1
+            return nonce
+
+    def _fee_cache_fresh(self):
+        cache = self._fee_cache
+        return cache["fields"] is not None and time.monotonic() - cache["ts"] < _FEE_CACHE_TTL
+
+    def _presign_reads(self, address):
+        # Send the reads register() still needs (nonce of an untracked address, chain id,
+        # fee data) as one JSON-RPC batch. Returns (nonce, latest_block, fee_history);
+        # each is None when it is cached locally or batching is unavailable.
+        need_nonce = address not in self._nonces
+        need_chain = self._chain_id is None
+        need_fees = not self._fee_cache_fresh()
+        # With an empty ring the full fee_history window rides along with the latest block;
+        # otherwise only the blocks missing from the ring are fetched afterwards
+        need_history = need_fees and not self._fh_ring
+        if need_nonce + need_chain + need_fees + need_history > 1 and self._presign_batch:
+            try:
+                with self.w3.batch_requests() as batch:
+                    if need_nonce:
+                        batch.add(self.w3.eth.get_transaction_count(address))
+                    if need_chain:
+                        batch.add(self.w3.eth.chain_id)
+                    if need_fees:
+                        batch.add(self.w3.eth.get_block("latest"))
+                    if need_history:
+                        batch.add(self.w3.eth.fee_history(_FH_BLOCKS, "latest", _FH_PERCENTILES))
+                    results = list(batch.execute())
+                nonce = results.pop(0) if need_nonce else None
+                if need_chain:
+                    self._chain_id = results.pop(0)
+                latest_block = results.pop(0) if need_fees else None
+                fh = results.pop(0) if need_history else None
+                return nonce, latest_block, fh
+            except Exception:
+                # e.g. a legacy node without eth_feeHistory; stop batching and use single calls
+                self._presign_batch = False
+        if need_chain:
+            self._chain_id = self.w3.eth.chain_id
+        return None, None, None
+
+    def _fee_fields(self, latest_block=None, fh=None):
+        # Fee fields stay valid across a few blocks, so bursts of register() calls share one estimate
+        if self._fee_cache_fresh():
+            return self._fee_cache["fields"]
+        if latest_block is None:
+            latest_block = self.w3.eth.get_block("latest")
+        eip1559_supported = isinstance(latest_block, Mapping) and ("baseFeePerGas" in latest_block)
         # Build transaction with EIP-1559 if supported, otherwise legacy gasPrice
-        common = {
-            "from": local_account.address,
-            "nonce": self.w3.eth.get_transaction_count(local_account.address),
-            "gas": 1000000,
-            "chainId": chain_id,
-        }
         if eip1559_supported:
             try:
                 # Use eth_feeHistory to estimate median tip and a robust fee cap
-                fh = self.w3.eth.fee_history(10, "latest", [50])
-                rewards = [r[0] for r in fh.get("reward", []) if isinstance(r, (list, tuple)) and len(r) > 0]
-                if rewards:
-                    tip = int(statistics.median(rewards))
-                else:
-                    tip = Web3.to_wei(2, "gwei")
-                base_fees = fh.get("baseFeePerGas", [])
-                if base_fees:
-                    # Next block suggested base fee is the last element
-                    next_base = int(base_fees[-1])
-                else:
+                tip, next_base = self._fee_history_estimate(int(latest_block["number"]), fh)
+                if next_base is None:
                     next_base = int(latest_block["baseFeePerGas"])
                 # Enforce a sane minimum tip
                 if tip < Web3.to_wei(1, "gwei"):
@@ -65,47 +284,192 @@ class IdentityContract:
                 base_fee = int(latest_block["baseFeePerGas"])
                 tip = Web3.to_wei(2, "gwei")
                 max_fee = base_fee * 2 + tip
-            fee_fields = {
+            fields = {
                 "maxPriorityFeePerGas": tip,
                 "maxFeePerGas": max_fee,
-                "type": 2,
             }
-            tx = self.contract.functions.register(agent_id, metadata).build_transaction({**common, **fee_fields})
         else:
-            legacy_fields = {
+            fields = {
                 "gasPrice": self.w3.eth.gas_price,
             }
-            tx = self.contract.functions.register(agent_id, metadata).build_transaction({**common, **legacy_fields})
-        signed = local_account.sign_transaction(tx)
-        raw = self._raw_tx_bytes(signed)
-        tx_hash = self.w3.eth.send_raw_transaction(raw)
-        return tx_hash.hex()
+        self._fee_cache = {"fields": fields, "ts": time.monotonic()}
+        return fields
+
+    def _fee_history_estimate(self, latest, fh=None):
+        # Returns (median tip, next base fee or None) for the _FH_BLOCKS blocks up to
+        # latest, fetching fee_history only for blocks the ring does not hold yet
+        with self._fh_lock:
+            if fh is not None:
+                self._fh_store(fh)
+            if self._fh_next_base is not None:
+                latest = max(latest, self._fh_next_base[0])
+            window = range(max(0, latest - _FH_BLOCKS + 1), latest + 1)
+            missing = [b for b in window if b not in self._fh_ring]
+            if missing:
+                self._fh_store(self.w3.eth.fee_history(latest - missing[0] + 1, latest, _FH_PERCENTILES))
+            for b in [b for b in self._fh_ring if b < latest - _FH_RETENTION]:
+                del self._fh_ring[b]
+            tip = _median(self._fh_ring[b][1][_FH_MEDIAN] for b in window if self._fh_ring.get(b, (0, None))[1])
+            next_base = None
+            if self._fh_next_base is not None and self._fh_next_base[0] == latest:
+                next_base = self._fh_next_base[1]
+        if tip is None:
+            tip = Web3.to_wei(2, "gwei")
+        return tip, next_base
+
+    def _fh_store(self, fh):
+        # Caller holds _fh_lock
+        oldest = int(fh["oldestBlock"])
+        count = len(fh.get("gasUsedRatio", []))
+        base_fees = fh.get("baseFeePerGas", [])
+        rewards = fh.get("reward", [])
+        for i in range(count):
+            reward = rewards[i] if i < len(rewards) else None
+            if not isinstance(reward, (list, tuple)) or len(reward) != len(_FH_PERCENTILES):
+                reward = None
+            else:
+                reward = [int(r) for r in reward]
+            base_fee = int(base_fees[i]) if i < len(base_fees) else 0
+            self._fh_ring[oldest + i] = (base_fee, reward)
+        if count and len(base_fees) > count:
+            # Next block suggested base fee is the last element
+            self._fh_next_base = (oldest + count - 1, int(base_fees[-1]))
 
     def get_entry(self, address):
         return self.contract.functions.getEntry(address).call()
 
-    def get_all_entries(self, from_block: int = 0, to_block: str | int = "latest"):
-        # Scan Registered events to discover all owners, then read current entries
-        topic0 = self.w3.keccak(text="Registered(address,string,string,uint256)").hex()
-        address = Web3.to_checksum_address(self.contract.address)
-        logs = self.w3.eth.get_logs({
-            "address": address,
-            "fromBlock": from_block,
-            "toBlock": to_block,
-            "topics": [topic0],
-        })
-        owners_lower = []
+    def get_all_entries(self, from_block: int = 0, to_block: str | int = "latest", chunk_size: int = 10_000):
+        return list(self.iter_all_entries(from_block, to_block, chunk_size))
+
+    def iter_all_entries(self, from_block: int = 0, to_block: str | int = "latest", chunk_size: int = 10_000):
+        # Discover all owners from Registered events, then read current entries;
+        # yields entries as they are read so callers never hold a full intermediate list
+        return self._iter_entries(self._iter_owners(from_block, to_block, chunk_size))
+
+    async def get_all_entries_async(
+        self, from_block: int = 0, to_block: str | int = "latest", chunk_size: int = 10_000
+    ):
+        # Same as get_all_entries, but all getEntry calls are in flight concurrently
+        owners = await asyncio.to_thread(lambda: list(self._iter_owners(from_block, to_block, chunk_size)))
+        # A session per call: aiohttp sessions are bound to the loop that created them,
+        # and callers may each run their own loop. The semaphore bounds the fan-out
+        limit = asyncio.Semaphore(_ASYNC_ENTRY_CONCURRENCY)
+        async with aiohttp.ClientSession() as session:
+            results = await asyncio.gather(
+                *[self._aget_entry(session, limit, owner) for owner in owners], return_exceptions=True
+            )
+        return [e for e in results if not isinstance(e, Exception)]
+
+    async def _aget_entry(self, session, limit, owner):
+        data = _GET_ENTRY_SELECTOR + bytes(12) + bytes.fromhex(owner[2:])
+        call = {"to": self._checksum_address, "data": "0x" + data.hex()}
+        async with limit:
+            result = await self._arpc(session, "eth_call", [call, "latest"])
+        owner_addr, agent_id, metadata, updated_at = self.w3.codec.decode(_ENTRY_TYPES, bytes.fromhex(result[2:]))[0]
+        # web3's contract calls return checksummed addresses; keep the same shape
+        return (Web3.to_checksum_address(owner_addr), agent_id, metadata, updated_at)
+
+    def get_all_entries_concurrent(
+        self, from_block: int = 0, to_block: str | int = "latest", chunk_size: int = 10_000
+    ):
+        # Blocking wrapper around get_all_entries_async for sync callers
+        return asyncio.run(self.get_all_entries_async(from_block, to_block, chunk_size))
+
+    def sync_owners(self, chunk_size: int = 10_000):
+        # Scan only the blocks after the last sync and add new owners to the index
+        return list(self._iter_indexed_owners(chunk_size))
+
+    def _iter_indexed_owners(self, chunk_size):
+        # Yield indexed owners first, then owners found in blocks after the last sync as
+        # the scan reaches them, so getEntry batches start before the scan finishes.
+        # The lock is only held for snapshots and updates, never across a yield;
+        # concurrent syncs may rescan the same blocks, which setdefault makes harmless.
+        with self._owners_lock:
+            known = list(self._owners)
+            start = self._last_scanned_block + 1
+        yield from known
+        latest = self.w3.eth.block_number
+        if latest < start:
+            return
+        indexed = set(known)
+        for owner in self._iter_unique_owners(start, latest, chunk_size):
+            with self._owners_lock:
+                self._owners.setdefault(owner, None)
+            if owner not in indexed:
+                yield owner
+        # Only a completed scan advances the watermark
+        with self._owners_lock:
+            self._last_scanned_block = max(self._last_scanned_block, latest)
+
+    def _iter_owners(self, from_block, to_block, chunk_size):
+        # The full history is served from the incremental index; other ranges are scanned directly
+        if from_block == 0 and to_block == "latest":
+            return self._iter_indexed_owners(chunk_size)
+        return self._iter_unique_owners(from_block, to_block, chunk_size)
+
+    def _iter_entries(self, owners):
+        # Read entries in batches of _ENTRY_BATCH as owners arrive, overlapping log scan and reads
+        batch = []
+        for owner in owners:
+            batch.append(owner)
+            if len(batch) >= _ENTRY_BATCH:
+                yield from self._get_entries(batch)
+                batch = []
+        if batch:
+            yield from self._get_entries(batch)
+
+    def _iter_registered_logs(self, from_block: int, to_block: str | int, chunk_size: int):
+        # Providers cap eth_getLogs ranges, so scan in windows and yield each window's logs.
+        # A window the provider rejects as too large is retried at half the size;
+        # successful windows grow back towards chunk_size.
+        if not isinstance(to_block, int):
+            to_block = self.w3.eth.block_number
+        chunk_size = max(1, chunk_size)
+        size = chunk_size
+        start = from_block
+        while start <= to_block:
+            end = min(start + size - 1, to_block)
+            try:
+                window = self._rpc("eth_getLogs", [{
+                    "address": self._checksum_address,
+                    "fromBlock": hex(start),
+                    "toBlock": hex(end),
+                    "topics": ["0x" + _REGISTERED_TOPIC0.hex()],
+                }])
+            except Exception as e:
+                msg = str(e).lower()
+                if size > 1 and any(k in msg for k in ("range", "limit", "exceed", "too many")):
+                    size = max(1, size // 2)
+                    continue
+                raise
+            yield window
+            start = end + 1
+            size = min(chunk_size, size + size // 2 + 1)
+
+    def _iter_unique_owners(self, from_block: int, to_block: str | int, chunk_size: int):
+        # owner is the last 20 bytes of the first indexed topic (topics[1]); dedup on the
+        # raw bytes so the EIP-55 checksum runs once per owner, not once per log
         seen = set()
-        for log in logs:
-            # owner is the first indexed topic (topics[1])
-            t1 = log["topics"][1].hex()
-            owner = Web3.to_checksum_address("0x" + t1[-40:])
-            low = owner.lower()
-            if low not in seen:
-                seen.add(low)
-                owners_lower.append(owner)
+        for logs in self._iter_registered_logs(from_block, to_block, chunk_size):
+            for log in logs:
+                owner = HexBytes(log["topics"][1])[-20:]
+                if owner not in seen:
+                    seen.add(owner)
+                    yield Web3.to_checksum_address(owner)
+
+    def _get_entries(self, owners):
+        # Read all entries in one JSON-RPC batch (one round trip instead of one per owner)
+        if owners and hasattr(self.w3, "batch_requests"):
+            try:
+                with self.w3.batch_requests() as batch:
+                    for owner in owners:
+                        batch.add(self.contract.functions.getEntry(owner))
+                    return list(batch.execute())
+            except Exception:
+                # A single failing call rejects the whole batch; retry per owner below
+                pass
         entries = []
-        for owner in owners_lower:
+        for owner in owners:
             try:
                 e = self.contract.functions.getEntry(owner).call()
                 entries.append(e)
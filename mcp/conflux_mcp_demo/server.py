@@ -1,21 +1,29 @@
 import os
 import json
 from fastapi import FastAPI, Body
+from fastapi.responses import JSONResponse
 # from .agent import Agent  # removed
-from .contract import IdentityContract
+from .contract import IdentityContract, pooled_session
 # from .storage import storage  # removed
 from eth_keys import keys as _ethkeys
-from .waku_client import WakuClient
+from .waku_client import AsyncWakuClient, WakuClient
 from typing import Dict, List, Optional, Any
 
 # Added imports for background worker and data structures
+import asyncio
+import sys
 import threading
 import time
-from collections import deque
+from collections import OrderedDict, deque
 from decimal import Decimal
 import hmac
 import hashlib
+import secrets
 import base64
+import re
+import orjson
+import functools
+from eth_utils import keccak
 
 # Configuration via environment variables with sensible defaults
 RPC_URL = os.getenv("RPC_URL", "http://conflux:8545")
@@ -38,121 +46,299 @@ else:
 contract = IdentityContract(RPC_URL, CONTRACT_ADDRESS, abi_path=ABI_PATH)
 # agent = Agent("agent-001", contract, storage)  # removed
 
-app = FastAPI()
+
+class _FastJSONResponse(JSONResponse):
+    # orjson for endpoint responses; stdlib json for what orjson rejects, such as
+    # integers wider than 64 bits (wei amounts in message bodies)
+    def render(self, content: Any) -> bytes:
+        try:
+            return orjson.dumps(content)
+        except TypeError:
+            return super().render(content)
+
+
+app = FastAPI(default_response_class=_FastJSONResponse)
 
 # --- Waku setup (Phase 1: relay + filter + store) ---
 WAKU_NODE_URL = os.getenv("WAKU_NODE_URL", "http://localhost:8645")
 WAKU_PUBSUB_TOPIC = os.getenv("WAKU_PUBSUB_TOPIC", "/app/agents/1")
 waku_client = WakuClient(WAKU_NODE_URL)
+# Non-blocking twin for the background poller; reuses the store peer the sync client found
+async_waku_client = AsyncWakuClient(WAKU_NODE_URL, peer_id=waku_client.peer_id)
 
 # Simple in-memory subscription registry: agent_id -> subscription_id
 _subs_by_agent: Dict[str, str] = {}
 # Per-agent in-memory inbox queue (lightweight background subscriber will fill this)
 _inbox_by_agent: Dict[str, deque] = {}
-# In-memory group membership: group_id -> set(agent_id)
-_group_members: Dict[str, set] = {}
-# Lock to protect subscriptions and group memberships
+# In-memory group membership: group_id -> frozenset(agent_id), and the reverse index
+# agent_id -> frozenset(group_id) kept in step with it
+_group_members: Dict[str, frozenset] = {}
+_groups_by_agent: Dict[str, frozenset] = {}
+# Serializes writers of subscriptions and group memberships. Both maps are copy-on-write:
+# writers publish a fresh dict, so readers use the current reference without locking
 _subs_lock = threading.Lock()
+# agent_id -> topics the live filter subscription was created with
+_sub_topics_by_agent: Dict[str, tuple] = {}
+# Background poller task and the loop it runs on; _poll_wake cuts its 1s tick short
+_bg_task: Optional["asyncio.Task"] = None
+_poll_loop: Optional[asyncio.AbstractEventLoop] = None
+_poll_wake: Optional[asyncio.Event] = None
+
+
+def _wake_poller() -> None:
+    # Safe from any thread; a no-op until the poller has started
+    loop = _poll_loop
+    if loop is not None and _poll_wake is not None:
+        loop.call_soon_threadsafe(_poll_wake.set)
+
+
+def _publish_groups(updates: Dict[str, frozenset]) -> None:
+    # Caller holds _subs_lock
+    global _group_members, _groups_by_agent
+    by_agent = dict(_groups_by_agent)
+    for gid, members in updates.items():
+        old = _group_members.get(gid, frozenset())
+        for aid in members - old:
+            by_agent[aid] = by_agent.get(aid, frozenset()) | {gid}
+        for aid in old - members:
+            by_agent[aid] = by_agent[aid] - {gid}
+    _group_members = {**_group_members, **updates}
+    _groups_by_agent = by_agent
+
+
+def _publish_sub(aid: str, sub_id: Optional[str]) -> None:
+    # Caller holds _subs_lock; None drops the subscription
+    global _subs_by_agent
+    subs = dict(_subs_by_agent)
+    if sub_id is None:
+        subs.pop(aid, None)
+    else:
+        subs[aid] = sub_id
+    _subs_by_agent = subs
+
+
+@functools.lru_cache(maxsize=4096)
+def _norm_aid(agent_id: str) -> str:
+    # Agent ids are normalized once at the endpoint boundary; internal helpers take the
+    # lowercased, interned form so repeat lookups skip both the lower() and the string compare
+    return sys.intern(agent_id.lower())
 
 
 def _direct_content_topic(agent_id: str) -> str:
-    return f"/agents/1/direct/{agent_id.lower()}"
+    return _direct_topic_normalized(agent_id.lower())
+
+
+def _direct_topic_normalized(aid: str) -> str:
+    # For ids already passed through _norm_aid; skips the redundant lower()
+    return f"/agents/1/direct/{aid}"
 
 
 def _group_content_topic(group_id: str) -> str:
     return f"/agents/1/group/{group_id}"
 
 
-def _current_topics_for_agent(agent_id: str) -> List[str]:
-    topics = [_direct_content_topic(agent_id)]
-    for gid, members in _group_members.items():
-        if agent_id.lower() in members:
-            topics.append(_group_content_topic(gid))
+def _current_topics_for_agent(aid: str) -> List[str]:
+    topics = [_direct_topic_normalized(aid)]
+    topics.extend(_group_content_topic(gid) for gid in sorted(_groups_by_agent.get(aid, ())))
     return topics
 
 
-def _ensure_inbox(agent_id: str) -> deque:
-    aid = agent_id.lower()
-    if aid not in _inbox_by_agent:
-        _inbox_by_agent[aid] = deque(maxlen=200)
-    return _inbox_by_agent[aid]
+def _ensure_inbox(aid: str) -> deque:
+    inbox = _inbox_by_agent.get(aid)
+    if inbox is None:
+        # setdefault is atomic, so racing creators end up sharing one deque
+        inbox = _inbox_by_agent.setdefault(aid, deque(maxlen=200))
+    return inbox
 
 
-def _refresh_subscription(agent_id: str) -> str:
-    """Recreate filter subscription for the agent with current topics."""
-    aid = agent_id.lower()
+def _refresh_subscription(aid: str) -> str:
+    """Recreate filter subscription for the agent with current topics, if they changed."""
     with _subs_lock:
         old = _subs_by_agent.get(aid)
-        topics = _current_topics_for_agent(aid)
+        topics = tuple(_current_topics_for_agent(aid))
+        if old and _sub_topics_by_agent.get(aid) == topics:
+            # Same topic set: the existing subscription is still correct
+            return old
         if old:
             try:
                 waku_client.filter_unsubscribe(old)
             except Exception:
                 pass
-        sub_id = waku_client.filter_subscribe(topics)
-        _subs_by_agent[aid] = sub_id
-        return sub_id
+        sub_id = waku_client.filter_subscribe(list(topics))
+        _publish_sub(aid, sub_id)
+        _sub_topics_by_agent[aid] = topics
+    _wake_poller()
+    return sub_id
+
+
+def _subscription_current(aid: str) -> bool:
+    return bool(_subs_by_agent.get(aid)) and _sub_topics_by_agent.get(aid) == tuple(_current_topics_for_agent(aid))
 
 
 # Dedup cache and store backfill config
 _DEDUP_MAX = int(os.getenv("WAKU_DEDUP_MAX", "500"))
 _STORE_BACKFILL_INTERVAL = int(os.getenv("WAKU_STORE_BACKFILL_INTERVAL", "10"))
-_dedup_cache: Dict[str, Dict[str, Any]] = {}  # agent_id -> {"deque": deque, "set": set}
+_dedup_cache: Dict[str, "OrderedDict[bytes, None]"] = {}  # agent_id -> LRU of fingerprints
+# Loopback delivery from send handlers races the poller; keeps check-and-mark atomic
+_dedup_lock = threading.Lock()
 _last_store_query_ts: Dict[str, float] = {}
 
 
 def _ensure_dedup(aid: str):
-    if aid not in _dedup_cache:
-        _dedup_cache[aid] = {"deque": deque(maxlen=_DEDUP_MAX), "set": set()}
-    return _dedup_cache[aid]
-
-
-def _fingerprint_envelope(env: Dict[str, Any]) -> str:
-    try:
-        return hashlib.sha256(json.dumps(env, separators=(",", ":"), sort_keys=True).encode("utf-8")).hexdigest()
-    except Exception:
-        return hashlib.sha256(str(env).encode("utf-8")).hexdigest()
-
-
-def _is_new_and_mark(aid: str, fp: str) -> bool:
-    cache = _ensure_dedup(aid)
-    s = cache["set"]
-    dq = cache["deque"]
-    if fp in s:
-        return False
-    # Mark new
-    if len(dq) == dq.maxlen and dq.maxlen:
-        # Evict oldest
-        oldest = dq[0]
-        dq.popleft()
-        s.discard(oldest)
-    dq.append(fp)
-    s.add(fp)
-    return True
-
-
-def _verify_hmac_envelope(envelope: Dict[str, Any]) -> bool:
-    secret = os.getenv("MESSAGE_HMAC_SECRET")
-    if not secret:
-        return False
-    sig = envelope.get("sig")
-    if not sig:
-        return False
+    seen = _dedup_cache.get(aid)
+    if seen is None:
+        seen = _dedup_cache.setdefault(aid, OrderedDict())
+    return seen
+
+
+def _fingerprint_bytes(content_topic: Optional[str], payload: bytes) -> bytes:
+    # Keyed on the published payload bytes rather than transport metadata, so the same
+    # message arriving via loopback, filter and store is delivered once. The key never
+    # leaves the process, so a 16-byte blake2b digest is plenty
+    return hashlib.blake2b((content_topic or "").encode("utf-8") + b"\n" + payload, digest_size=16).digest()
+
+
+def _is_new_and_mark(aid: str, fp: bytes) -> bool:
+    seen = _ensure_dedup(aid)
+    with _dedup_lock:
+        if fp in seen:
+            # Re-seen messages stay hot so a chatty store backfill can't evict them
+            seen.move_to_end(fp)
+            return False
+        seen[fp] = None
+        if len(seen) > _DEDUP_MAX:
+            seen.popitem(last=False)
+        return True
+
+
+def _canonical_envelope(envelope: Dict[str, Any]) -> Optional[bytes]:
+    """Canonical bytes of the signed envelope fields, as covered by the HMAC."""
     base = {
         k: envelope.get(k)
-        for k in ["type", "from", "to", "group", "ts", "body"]
+        # "id" is optional so envelopes from senders that predate it still verify
+        for k in ["type", "from", "to", "group", "ts", "id", "body"]
         if k in envelope
     }
+    # Stays on stdlib json: orjson writes non-ASCII as raw UTF-8 where json escapes it,
+    # which would change the signed bytes and break verification against other senders
     try:
-        canonical = json.dumps(base, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        return json.dumps(base, separators=(",", ":"), sort_keys=True).encode("utf-8")
     except Exception:
-        return False
-    expected = hmac.new(secret.encode("utf-8"), canonical, hashlib.sha256).hexdigest()
-    return hmac.compare_digest(sig, expected)
+        return None
+
+
+# Envelope HMAC key, read once. The keyed prototype is copied per message so the
+# ipad/opad key schedule is not recomputed every time
+_HMAC_SECRET: Optional[bytes] = os.getenv("MESSAGE_HMAC_SECRET", "").encode("utf-8") or None
+_HMAC_PROTO = hmac.new(_HMAC_SECRET, digestmod=hashlib.sha256) if _HMAC_SECRET else None
+
+
+def _hmac_hex(canonical: bytes) -> str:
+    h = _HMAC_PROTO.copy()
+    h.update(canonical)
+    return h.hexdigest()
+
+
+def _verify_hmac_batch(items: List[tuple]) -> List[bool]:
+    """Verify [(canonical, sig), ...] in one sweep off the shared keyed prototype."""
+    if _HMAC_PROTO is None:
+        return [False] * len(items)
+    return [bool(sig) and hmac.compare_digest(sig, _hmac_hex(canonical)) for canonical, sig in items]
+
+
+def _deliver_waku_messages(msgs: List[Dict[str, Any]], aids: List[str]) -> None:
+    """Dedup, decode and verify a poll batch, appending new messages to each listener's inbox."""
+    fresh = []
+    for m in msgs:
+        inner = m.get("message", {})
+        raw = _decode_waku_payload(m.get("payload") or inner.get("payload"))
+        if not raw:
+            continue
+        content_topic = m.get("contentTopic") or inner.get("contentTopic")
+        # Store backfill is mostly repeats; the raw-bytes fingerprint lets those skip
+        # JSON decoding and HMAC entirely when every listener has already seen them
+        fp = _fingerprint_bytes(content_topic, raw)
+        if all(fp in _dedup_cache.get(aid, ()) for aid in aids):
+            # Still refresh recency: store_query keeps returning the oldest page, so a
+            # repeat that aged out of the LRU would be redelivered
+            with _dedup_lock:
+                for aid in aids:
+                    seen = _dedup_cache.get(aid)
+                    if seen is not None and fp in seen:
+                        seen.move_to_end(fp)
+            continue
+        try:
+            # stdlib json: orjson turns integers wider than 64 bits into floats, which
+            # changes the canonical bytes and fails the HMAC check
+            body = json.loads(raw)
+        except Exception:
+            continue
+        if not isinstance(body, dict):
+            continue
+        canonical = _canonical_envelope(body)
+        if canonical is None:
+            continue
+        env = {
+            "pubsubTopic": m.get("pubsubTopic"),
+            "contentTopic": content_topic,
+            "timestamp": m.get("timestamp") or inner.get("timestamp"),
+            "payload": body,
+        }
+        fresh.append((fp, env, canonical, body.get("sig")))
+    verified = _verify_hmac_batch([(d[2], d[3]) for d in fresh])
+    # Only verified messages are marked, so a forged copy never shadows the genuine one
+    accepted = [(fp, env) for (fp, env, _, _), ok in zip(fresh, verified) if ok]
+    if not accepted:
+        return
+    for aid in aids:
+        new = [env for fp, env in accepted if _is_new_and_mark(aid, fp)]
+        if new:
+            # One extend per agent per batch: a single atomic deque op for the reader to race
+            _ensure_inbox(aid).extend(new)
 
 
 # --- Core->eSpace funding helper ---
 
+# Pooled keep-alive session for the Core node, shared by raw JSON-RPC batches and the SDK provider
+_rpc_session = pooled_session()
+
+# Process-lifetime constants for funding: transferEVM(bytes20) selector and the
+# CrossSpaceCall internal contract address
+_TRANSFER_EVM_SELECTOR = keccak(text="transferEVM(bytes20)")[:4]
+_INTERNAL_ADDR_HEX = "0x0888000000000000000000000000000000000006"
+# (core_rpc, core_pk) -> (network_id, sender_b32, internal_addr_b32); filled on first funding
+_core_addr_cache: Dict[tuple, tuple] = {}
+
+
+@functools.lru_cache(maxsize=None)
+def _conflux_sdk():
+    from conflux_web3 import Web3 as CWeb3
+    from cfx_account import Account as CfxAccount
+    return CWeb3, CfxAccount
+
+
+@functools.lru_cache(maxsize=None)
+def _core_client(core_rpc: str, core_pk: str):
+    """Conflux SDK client and signer account, built once per (rpc, key)."""
+    CWeb3, CfxAccount = _conflux_sdk()
+    return CWeb3(CWeb3.HTTPProvider(core_rpc, session=_rpc_session)), CfxAccount.from_key(core_pk)
+
+
+def _batch_call(url: str, calls: List[tuple]) -> List[Any]:
+    """POST calls [(method, params), ...] as one JSON-RPC 2.0 batch.
+    Returns results in request order, with None for items that came back as errors.
+    """
+    payload = [{"jsonrpc": "2.0", "id": i, "method": m, "params": p} for i, (m, p) in enumerate(calls)]
+    resp = _rpc_session.post(url, json=payload, timeout=10)
+    resp.raise_for_status()
+    body = resp.json()
+    if not isinstance(body, list):
+        raise RuntimeError(body.get("error") if isinstance(body, dict) else body)
+    # Servers may answer out of order; match by id
+    by_id = {r.get("id"): r for r in body if isinstance(r, dict)}
+    return [by_id.get(i, {}).get("result") for i in range(len(calls))]
+
+
 def _fund_espace_or_raise(espace_address: str) -> str:
     """Transfer CFX from Core Space to given eSpace address using CrossSpaceCall.transferEVM.
     This is mandatory: raise an exception on any failure, and wait for on-chain confirmation.
@@ -194,8 +380,7 @@ def _fund_espace_or_raise(espace_address: str) -> str:
         raise HTTPException(status_code=500, detail="CORE_PK is not set; cannot fund eSpace account")
 
     try:
-        from conflux_web3 import Web3 as CWeb3
-        from cfx_account import Account as CfxAccount
+        CWeb3, _ = _conflux_sdk()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Conflux SDK import failed: {e}")
 
@@ -206,56 +391,79 @@ def _fund_espace_or_raise(espace_address: str) -> str:
             pass
 
     try:
-        c = CWeb3(CWeb3.HTTPProvider(core_rpc))
-        acct = CfxAccount.from_key(core_pk)
-        # Resolve Core network id to produce proper CIP-37 base32 addresses
-        try:
-            network_id = int(c.cfx.chain_id)
-        except Exception:
-            network_id = None
+        c, acct = _core_client(core_rpc, core_pk)
+        sender_hex_maybe = getattr(acct, "address", None)
+        cached = _core_addr_cache.get((core_rpc, core_pk))
+        if cached is not None:
+            network_id, sender_b32, internal_addr_b32 = cached
+        else:
+            # Resolve Core network id to produce proper CIP-37 base32 addresses
+            try:
+                network_id = int(c.cfx.chain_id)
+            except Exception:
+                network_id = None
 
-        # Convert sender and internal contract address to CIP-37 base32 explicitly
-        def to_base32(addr: str) -> str:
-            return c.address(addr, network_id=network_id) if network_id is not None else c.address(addr)
+            # Convert sender and internal contract address to CIP-37 base32 explicitly
+            def to_base32(addr: str) -> str:
+                return c.address(addr, network_id=network_id) if network_id is not None else c.address(addr)
 
-        sender_hex_maybe = getattr(acct, "address", None)
-        try:
-            sender_b32 = to_base32(sender_hex_maybe)
-        except Exception:
-            # Fallback: derive address again via w3.account to ensure base32
-            sender_b32 = to_base32(CWeb3.to_checksum_address(sender_hex_maybe)) if isinstance(sender_hex_maybe, str) else to_base32(str(sender_hex_maybe))
+            try:
+                sender_b32 = to_base32(sender_hex_maybe)
+            except Exception:
+                # Fallback: derive address again via w3.account to ensure base32
+                sender_b32 = to_base32(CWeb3.to_checksum_address(sender_hex_maybe)) if isinstance(sender_hex_maybe, str) else to_base32(str(sender_hex_maybe))
 
-        internal_addr_hex = "0x0888000000000000000000000000000000000006"
-        try:
-            internal_addr_b32 = to_base32(internal_addr_hex)
-        except Exception:
-            internal_addr_b32 = internal_addr_hex
+            try:
+                internal_addr_b32 = to_base32(_INTERNAL_ADDR_HEX)
+            except Exception:
+                internal_addr_b32 = _INTERNAL_ADDR_HEX
+            # Only cache a fully resolved identity so a transient chain_id failure is retried
+            if network_id is not None:
+                _core_addr_cache[(core_rpc, core_pk)] = (network_id, sender_b32, internal_addr_b32)
 
         # Manual ABI encode: transferEVM(bytes20)
-        selector = CWeb3.keccak(text="transferEVM(bytes20)")[:4]
         # Normalize eSpace address to 20 bytes (lowercase hex without 0x)
         to_bytes20 = bytes.fromhex(espace_address[2:].lower())
         param = to_bytes20 + (b"\x00" * 12)  # right-pad to 32 bytes
-        data = (selector + param).hex()
+        data = (_TRANSFER_EVM_SELECTOR + param).hex()
         # value already computed above from amt
+        # Independent pre-flight reads in one round trip
         try:
-            nonce = c.cfx.get_next_nonce(sender_b32)
-        except Exception:
-            nonce = c.cfx.get_transaction_count(sender_b32)
-        try:
-            epoch_height = c.cfx.epoch_number
-            epoch_height = epoch_height if isinstance(epoch_height, int) else int(epoch_height)
-        except Exception:
-            epoch_height = 0
-        try:
-            gas_price = c.cfx.gas_price
+            nonce, epoch_height, gas_price = _batch_call(core_rpc, [
+                ("cfx_getNextNonce", [sender_b32]),
+                ("cfx_epochNumber", ["latest_mined"]),
+                ("cfx_gasPrice", []),
+            ])
         except Exception:
-            gas_price = 1
+            nonce = epoch_height = gas_price = None
+        # Fall back to single SDK calls for anything the batch did not return
+        if nonce is not None:
+            nonce = int(nonce, 16)
+        else:
+            try:
+                nonce = c.cfx.get_next_nonce(sender_b32)
+            except Exception:
+                nonce = c.cfx.get_transaction_count(sender_b32)
+        if epoch_height is not None:
+            epoch_height = int(epoch_height, 16)
+        else:
+            try:
+                epoch_height = c.cfx.epoch_number
+                epoch_height = epoch_height if isinstance(epoch_height, int) else int(epoch_height)
+            except Exception:
+                epoch_height = 0
+        if gas_price is not None:
+            gas_price = int(gas_price, 16)
+        else:
+            try:
+                gas_price = c.cfx.gas_price
+            except Exception:
+                gas_price = 1
         # Minimal gas/storage defaults
         gas = 300000
         storage_limit = 2048
 
-        _dbg(f"sender_b32={sender_b32} internal_b32={internal_addr_b32} sender_hex_or_obj={sender_hex_maybe} espace_hex={espace_address} nonce={nonce} epoch={epoch_height} chainId={c.cfx.chain_id} gas={gas} storageLimit={storage_limit}")
+        _dbg(f"sender_b32={sender_b32} internal_b32={internal_addr_b32} sender_hex_or_obj={sender_hex_maybe} espace_hex={espace_address} nonce={nonce} epoch={epoch_height} chainId={network_id} gas={gas} storageLimit={storage_limit}")
 
         tx = {
             "from": sender_b32,  # explicitly use CIP-37 base32
@@ -267,7 +475,7 @@ def _fund_espace_or_raise(espace_address: str) -> str:
             "gasPrice": gas_price,
             "storageLimit": storage_limit,
             "epochHeight": epoch_height,
-            "chainId": c.cfx.chain_id,
+            "chainId": network_id if network_id is not None else c.cfx.chain_id,
         }
         signed = acct.sign_transaction(tx)
         tx_hash = c.cfx.send_raw_transaction(signed.raw_transaction)
@@ -301,78 +509,84 @@ def _fund_espace_or_raise(espace_address: str) -> str:
 
 
 # Background poller to fetch messages for each active subscription and fill inboxes
-_bg_thread_started = False
 
-def _bg_poll_loop():
+async def _poll_agent(aid: str, sub_id: str) -> None:
+    try:
+        msgs = await async_waku_client.filter_get_messages(sub_id) or []
+    except Exception:
+        msgs = []
+    _deliver_waku_messages(msgs, [aid])
+
+
+async def _backfill_topic(topic: str, aids: List[str]) -> None:
+    # One store query per topic, fanned out to every agent listening on it
+    try:
+        res = await async_waku_client.store_query([topic], pubsub_topic=WAKU_PUBSUB_TOPIC)
+        store_msgs = res.get("messages", []) if isinstance(res, dict) else (res or [])
+    except Exception:
+        return
+    _deliver_waku_messages(store_msgs, aids)
+
+
+async def _bg_poll_loop():
     while True:
         try:
-            with _subs_lock:
-                items = list(_subs_by_agent.items())
+            items = list(_subs_by_agent.items())
             now = time.time()
-            for aid, sub_id in items:
-                # 1) Filter poll
-                try:
-                    msgs = waku_client.filter_get_messages(sub_id) or []
-                except Exception:
-                    msgs = []
-                for m in msgs:
-                    payload_hex = m.get("payload") or m.get("message", {}).get("payload")
-                    try:
-                        raw = _decode_waku_payload(payload_hex)
-                        body = json.loads(raw.decode("utf-8"))
-                    except Exception:
-                        body = None
-                    if isinstance(body, dict) and _verify_hmac_envelope(body):
-                        env = {
-                            "pubsubTopic": m.get("pubsubTopic"),
-                            "contentTopic": m.get("contentTopic") or m.get("message", {}).get("contentTopic"),
-                            "timestamp": m.get("timestamp") or m.get("message", {}).get("timestamp"),
-                            "payload": body,
-                        }
-                        fp = _fingerprint_envelope(env)
-                        if _is_new_and_mark(aid, fp):
-                            _ensure_inbox(aid).append(env)
-                # 2) Store backfill (periodic)
-                last = _last_store_query_ts.get(aid, 0)
-                if now - last >= _STORE_BACKFILL_INTERVAL:
+            # 1) Filter poll. Agents are independent, so poll them concurrently
+            jobs = [_poll_agent(aid, sub_id) for aid, sub_id in items]
+            # 2) Store backfill (periodic), deduplicated by topic across agents that are due
+            listeners: Dict[str, List[str]] = {}
+            for aid, _ in items:
+                if now - _last_store_query_ts.get(aid, 0) >= _STORE_BACKFILL_INTERVAL:
                     _last_store_query_ts[aid] = now
-                    topics = _current_topics_for_agent(aid)
-                    for t in topics:
-                        store_msgs = []
-                        try:
-                            res = waku_client.store_query([t], pubsub_topic=WAKU_PUBSUB_TOPIC)
-                            store_msgs = res.get("messages", []) if isinstance(res, dict) else (res or [])
-                        except Exception:
-                            store_msgs = []
-                        for sm in store_msgs:
-                            payload_hex = sm.get("payload") or sm.get("message", {}).get("payload")
-                            try:
-                                raw = _decode_waku_payload(payload_hex)
-                                body = json.loads(raw.decode("utf-8"))
-                            except Exception:
-                                body = None
-                            if isinstance(body, dict) and _verify_hmac_envelope(body):
-                                env = {
-                                    "pubsubTopic": sm.get("pubsubTopic"),
-                                    "contentTopic": sm.get("contentTopic") or sm.get("message", {}).get("contentTopic"),
-                                    "timestamp": sm.get("timestamp") or sm.get("message", {}).get("timestamp"),
-                                    "payload": body,
-                                }
-                                fp = _fingerprint_envelope(env)
-                                if _is_new_and_mark(aid, fp):
-                                    _ensure_inbox(aid).append(env)
+                    for t in _current_topics_for_agent(aid):
+                        listeners.setdefault(t, []).append(aid)
+            jobs += [_backfill_topic(t, aids) for t, aids in listeners.items()]
+            # All requests are in flight at once on the client's pooled session
+            await asyncio.gather(*jobs, return_exceptions=True)
         except Exception:
             pass
-        time.sleep(1.0)
+        try:
+            await asyncio.wait_for(_poll_wake.wait(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+        _poll_wake.clear()
 
 
 @app.on_event("startup")
-def _start_bg_thread():
-    global _bg_thread_started
-    if not _bg_thread_started:
-        t = threading.Thread(target=_bg_poll_loop, daemon=True)
-        t.start()
-        _bg_thread_started = True
+async def _start_bg_poller():
+    global _bg_task, _poll_loop, _poll_wake
+    if _bg_task is None:
+        _poll_loop = asyncio.get_running_loop()
+        _poll_wake = asyncio.Event()
+        _bg_task = asyncio.create_task(_bg_poll_loop())
+
+
+@app.on_event("shutdown")
+async def _stop_bg_poller():
+    global _bg_task, _poll_loop
+    if _bg_task is not None:
+        _bg_task.cancel()
+        _bg_task = None
+    _poll_loop = None
+    await async_waku_client.close()
+    waku_client.close()
+
+
+# identity.json path -> ((mtime_ns, size), parsed data); re-read only when the file changes
+_identity_cache: Dict[str, tuple] = {}
+
+
+def _load_identity(path) -> Any:
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    hit = _identity_cache.get(str(path))
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    data = orjson.loads(path.read_bytes())
+    _identity_cache[str(path)] = (stamp, data)
+    return data
 
 
 @app.post("/register_recall_id")
@@ -405,30 +619,29 @@ def register_recall_id(
     # 2) Check if identity.json file exists in memory path directory
     mem_dir = Path(mem_path)
     identity_file = mem_dir / "identity.json"
-    if identity_file.exists():
-        try:
-            with open(identity_file, "r") as f:
-                agent_data = _json.load(f)
-            if isinstance(agent_data, dict) and agent_data.get("agent_id"):
-                # Found existing agent identity, return it (ignore input arguments)
-                caps = agent_data.get("capabilities", [])
-                waku_info = {
-                    "pubKey": agent_data.get("waku_pubkey"),
-                    "directTopic": agent_data.get("waku_direct_topic"),
-                    "pubsub": agent_data.get("waku_pubsub_topic"),
-                }
-                return {
-                    "agent_id": agent_data.get("agent_id"),
-                    "name": agent_data.get("name"),
-                    "description": agent_data.get("description", ""),
-                    "capabilities": caps,
-                    "waku": waku_info,
-                    "memory_file": str(identity_file),
-                    "tx_hash": "existing_agent_no_new_transaction",
-                    "status": "existing_identity_returned"
-                }
-        except Exception:
-            pass  # Continue with new registration if file read fails
+    # A missing file raises from the stat inside _load_identity and falls through to registration
+    try:
+        agent_data = _load_identity(identity_file)
+        if isinstance(agent_data, dict) and agent_data.get("agent_id"):
+            # Found existing agent identity, return it (ignore input arguments)
+            caps = agent_data.get("capabilities", [])
+            waku_info = {
+                "pubKey": agent_data.get("waku_pubkey"),
+                "directTopic": agent_data.get("waku_direct_topic"),
+                "pubsub": agent_data.get("waku_pubsub_topic"),
+            }
+            return {
+                "agent_id": agent_data.get("agent_id"),
+                "name": agent_data.get("name"),
+                "description": agent_data.get("description", ""),
+                "capabilities": caps,
+                "waku": waku_info,
+                "memory_file": str(identity_file),
+                "tx_hash": "existing_agent_no_new_transaction",
+                "status": "existing_identity_returned"
+            }
+    except Exception:
+        pass  # Continue with new registration if file read fails
 
     # 3) Create new agent identity since no existing one found
     acct = Account.create()
@@ -510,8 +723,7 @@ def register_recall_id(
 @app.get("/collect_identities")
 def collect_identities():
     # Fetch all entries from on-chain storage by scanning events
-    entries = contract.get_all_entries()
-    # entries are tuples (owner, agentId, metadata, updatedAt)
+    # entries are tuples (owner, agentId, metadata, updatedAt), streamed from the contract
     result = [
         {
             "owner": e[0],
@@ -519,7 +731,7 @@ def collect_identities():
             "metadata": e[2],
             "updatedAt": e[3],
         }
-        for e in entries
+        for e in contract.iter_all_entries()
     ]
     return {"agents": result}
 
@@ -527,37 +739,43 @@ def collect_identities():
 # --- Waku messaging endpoints (Phase 1) ---
 @app.post("/waku/subscribe")
 def waku_subscribe(agent_id: str = Body(...), groups: Optional[List[str]] = Body(default=None)):
+    aid = _norm_aid(agent_id)
     # Update group memberships first if provided
     if groups:
         with _subs_lock:
-            for g in groups:
-                _group_members.setdefault(g, set()).add(agent_id.lower())
-    sub_id = _refresh_subscription(agent_id)
-    return {"subscription_id": sub_id, "content_topics": _current_topics_for_agent(agent_id)}
+            _publish_groups({g: _group_members.get(g, frozenset()) | {aid} for g in groups})
+    sub_id = _refresh_subscription(aid)
+    return {"subscription_id": sub_id, "content_topics": _current_topics_for_agent(aid)}
 
 
 @app.post("/waku/unsubscribe")
 def waku_unsubscribe(agent_id: str = Body(...)):
+    aid = _norm_aid(agent_id)
     with _subs_lock:
-        sub_id = _subs_by_agent.get(agent_id.lower())
+        sub_id = _subs_by_agent.get(aid)
         if not sub_id:
             return {"ok": True, "message": "No active subscription"}
         ok = waku_client.filter_unsubscribe(sub_id)
-        _subs_by_agent.pop(agent_id.lower(), None)
+        _publish_sub(aid, None)
+        _sub_topics_by_agent.pop(aid, None)
     return {"ok": ok}
 
 
 @app.get("/waku/messages")
-def waku_messages(agent_id: str, max_items: int = 50):
-    # Ensure subscription exists and reflects current groups
-    _refresh_subscription(agent_id)
-    inbox = _ensure_inbox(agent_id)
+async def waku_messages(agent_id: str, max_items: int = 50):
+    # Ensure subscription exists and reflects current groups. Steady state is in-memory
+    # only, so this handler runs on the event loop; resubscribing goes to a worker thread
+    aid = _norm_aid(agent_id)
+    if not _subscription_current(aid):
+        await asyncio.to_thread(_refresh_subscription, aid)
+    inbox = _ensure_inbox(aid)
     out = []
-    for _ in range(min(max_items, len(inbox))):
-        try:
+    try:
+        for _ in range(min(max_items, len(inbox))):
             out.append(inbox.popleft())
-        except Exception:
-            break
+    except IndexError:
+        # Another reader drained the inbox concurrently
+        pass
     return {"messages": out}
 
 
@@ -582,17 +800,21 @@ def waku_send(
         "to": to_agent,
         "group": group,
         "ts": int(time.time()),
+        # Per-send nonce: identical messages sent within the same second stay distinct
+        # for dedup, while loopback and relayed copies of one send still collapse
+        "id": secrets.token_hex(8),
         "body": message,
     }
     # HMAC signature (required)
-    secret = os.getenv("MESSAGE_HMAC_SECRET")
-    if not secret:
+    if _HMAC_PROTO is None:
         raise HTTPException(status_code=500, detail="MESSAGE_HMAC_SECRET is not set; cannot sign messages")
     canonical = json.dumps(base_envelope, separators=(",", ":"), sort_keys=True).encode("utf-8")
-    signature = hmac.new(secret.encode("utf-8"), canonical, hashlib.sha256).hexdigest()
+    signature = _hmac_hex(canonical)
     envelope = {**base_envelope, "sig": signature, "sig_alg": "HMAC-SHA256"}
 
-    payload = json.dumps(envelope, separators=(",", ":")).encode("utf-8")
+    # Splice the signature into the already-serialized canonical object instead of
+    # dumping the envelope a second time
+    payload = canonical[:-1] + b',"sig":"' + signature.encode("ascii") + b'","sig_alg":"HMAC-SHA256"}'
 
     # Publish
     try:
@@ -600,26 +822,26 @@ def waku_send(
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Waku publish failed: {e}")
 
-    # Local loopback delivery so recipients can read immediately even if REST Filter/Store is unavailable
-    try:
-        env = {
-            "pubsubTopic": WAKU_PUBSUB_TOPIC,
-            "contentTopic": content_topic,
-            "timestamp": int(time.time() * 1_000_000_000),  # ns
-            "payload": envelope,
-        }
-        if to_agent:
-            targets = [to_agent.lower()]
-        else:
-            with _subs_lock:
-                targets = sorted(list(_group_members.get(group, set())))  # type: ignore[arg-type]
-        for aid in targets:
-            fp = _fingerprint_envelope(env)
-            if _is_new_and_mark(aid, fp):
-                _ensure_inbox(aid).append(env)
-    except Exception:
-        # Non-fatal: best-effort local delivery
-        pass
+    # Local loopback delivery so recipients can read immediately even if REST Filter/Store is unavailable.
+    # Member sets are immutable snapshots, so iterate them directly; an empty group skips it all
+    targets = (_norm_aid(to_agent),) if to_agent else _group_members.get(group, ())  # type: ignore[arg-type]
+    if targets:
+        try:
+            env = {
+                "pubsubTopic": WAKU_PUBSUB_TOPIC,
+                "contentTopic": content_topic,
+                "timestamp": int(time.time() * 1_000_000_000),  # ns
+                "payload": envelope,
+            }
+            fp = _fingerprint_bytes(content_topic, payload)
+            for aid in targets:
+                if _is_new_and_mark(aid, fp):
+                    _ensure_inbox(aid).append(env)
+            # Pull anything relayed alongside this send without waiting for the next tick
+            _wake_poller()
+        except Exception:
+            # Non-fatal: best-effort local delivery
+            pass
 
     return {
         "ok": True,
@@ -631,38 +853,37 @@ def waku_send(
 # --- Group listing endpoints ---
 @app.get("/groups/list")
 def groups_list():
-    with _subs_lock:
-        items = [{"group": gid, "members": len(members)} for gid, members in _group_members.items()]
+    items = [{"group": gid, "members": len(members)} for gid, members in _group_members.items()]
     items.sort(key=lambda x: x["group"])  # stable order
     return {"groups": items}
 
 
 @app.get("/groups/members")
 def groups_members(group_id: str):
-    with _subs_lock:
-        members = sorted(list(_group_members.get(group_id, set())))
+    members = sorted(_group_members.get(group_id, ()))
     return {"group": group_id, "members": members}
 
 
 @app.post("/groups/create")
 def groups_create(group_id: str = Body(...), creator: Optional[str] = Body(default=None)):
     gid = group_id
+    aid = _norm_aid(creator) if creator else None
     with _subs_lock:
-        if gid not in _group_members:
-            _group_members[gid] = set()
-        if creator:
-            _group_members[gid].add(creator.lower())
-    if creator:
-        _refresh_subscription(creator)
-    return {"ok": True, "group": gid, "members": sorted(list(_group_members[gid]))}
+        members = _group_members.get(gid, frozenset())
+        if aid:
+            members = members | {aid}
+        _publish_groups({gid: members})
+    if aid:
+        _refresh_subscription(aid)
+    return {"ok": True, "group": gid, "members": sorted(members)}
 
 
 @app.post("/groups/join")
 def groups_join(group_id: str = Body(...), agent_id: str = Body(...)):
     gid = group_id
-    aid = agent_id.lower()
+    aid = _norm_aid(agent_id)
     with _subs_lock:
-        _group_members.setdefault(gid, set()).add(aid)
+        _publish_groups({gid: _group_members.get(gid, frozenset()) | {aid}})
     sub_id = _refresh_subscription(aid)
     return {"ok": True, "group": gid, "agent": aid, "subscription_id": sub_id}
 
@@ -670,14 +891,17 @@ def groups_join(group_id: str = Body(...), agent_id: str = Body(...)):
 @app.post("/groups/leave")
 def groups_leave(group_id: str = Body(...), agent_id: str = Body(...)):
     gid = group_id
-    aid = agent_id.lower()
+    aid = _norm_aid(agent_id)
     with _subs_lock:
-        if gid in _group_members and aid in _group_members[gid]:
-            _group_members[gid].remove(aid)
+        if aid in _group_members.get(gid, ()):
+            _publish_groups({gid: _group_members[gid] - {aid}})
     sub_id = _refresh_subscription(aid)
     return {"ok": True, "group": gid, "agent": aid, "subscription_id": sub_id}
 
 
+_HEX_RE = re.compile(r"[0-9a-fA-F]*")
+
+
 def _decode_waku_payload(payload_value: Any) -> bytes:
     """Decode Waku payload from hex (with or without 0x) or base64 to raw bytes."""
     if isinstance(payload_value, (bytes, bytearray)):
@@ -685,19 +909,11 @@ def _decode_waku_payload(payload_value: Any) -> bytes:
     if not isinstance(payload_value, str):
         return b""
     s = payload_value.strip()
-    # Try hex with 0x prefix
-    if s.startswith("0x"):
-        try:
-            return bytes.fromhex(s[2:])
-        except Exception:
-            pass
-    # Try hex without prefix
-    try:
-        return bytes.fromhex(s)
-    except Exception:
-        pass
-    # Try base64
+    # Sniff the encoding up front rather than using failed decodes as control flow
+    h = s[2:] if s.startswith("0x") else s
+    if not len(h) % 2 and _HEX_RE.fullmatch(h):
+        return bytes.fromhex(h)
     try:
         return base64.b64decode(s, validate=True)
     except Exception:
-        return b""
\ No newline at end of file
+        return b""
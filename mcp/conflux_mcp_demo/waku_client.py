@@ -1,9 +1,71 @@
+import functools
 import os
 import time
 from typing import Any, Dict, List, Optional
 
+import aiohttp
+import orjson
 import requests
-import base64
+from urllib3.util.retry import Retry
+import binascii
+
+from .contract import pooled_session
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+@functools.lru_cache(maxsize=None)
+def _rpc_prefix(method: str) -> bytes:
+    # Static head of a JSON-RPC envelope; only the id and params vary per call
+    return b'{"jsonrpc":"2.0","method":' + orjson.dumps(method) + b',"id":'
+
+
+def _rpc_body(method: str, rpc_id: int, params: Any) -> bytes:
+    return _rpc_prefix(method) + str(rpc_id).encode() + b',"params":' + orjson.dumps(params) + b"}"
+
+
+def _store_params(
+    content_topics: List[str],
+    pubsub_topic: Optional[str],
+    peer_id: Optional[str],
+    start_time_ns: Optional[int],
+    end_time_ns: Optional[int],
+    page_size: int,
+) -> List[tuple]:
+    params: List[tuple] = [("contentTopics", t) for t in content_topics]
+    params.append(("pageSize", str(page_size)))
+    params.append(("ascending", "true"))
+    if pubsub_topic:
+        params.append(("pubsubTopic", pubsub_topic))
+    if peer_id:
+        params.append(("peerId", peer_id))
+    if start_time_ns is not None:
+        params.append(("startTime", str(start_time_ns)))
+    if end_time_ns is not None:
+        params.append(("endTime", str(end_time_ns)))
+    return params
+
+
+def _http_session(base_url: str) -> Any:
+    # HTTP/2 multiplexes concurrent calls over one connection, but httpx only negotiates
+    # it over TLS (ALPN) and needs the optional h2 package (pip install "httpx[http2]").
+    # nwaku's own REST server is plain HTTP/1.1, so this only applies behind an https proxy.
+    if base_url.startswith("https://"):
+        try:
+            import h2  # noqa: F401
+            import httpx
+        except ImportError:
+            pass
+        else:
+            return httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+                headers={"Connection": "keep-alive"},
+            )
+    # One keep-alive pool for every call; the poller hits the node once per topic per tick.
+    # No transport retries: relay publish is not idempotent
+    return pooled_session(pool_connections=32, pool_maxsize=64, retries=Retry(total=0))
 
 
 class WakuClient:
@@ -15,15 +77,23 @@ class WakuClient:
 
     def __init__(self, rpc_url: Optional[str] = None, timeout: int = 10):
         self.rpc_url = rpc_url or os.getenv("WAKU_NODE_URL", "http://localhost:8645")
+        # REST endpoint URLs are fixed per node; build them once
+        base = self.rpc_url.rstrip("/")
+        self._info_url = f"{base}/debug/v1/info"
+        self._relay_url = f"{base}/relay/v1/auto/messages"
+        self._store_url = f"{base}/store/v1/messages"
         self._id = 0
         self.timeout = timeout
+        # requests or httpx. get/post(json=...)/close behave the same on both, but raw
+        # bytes go in data= on requests and content= on httpx (data= is deprecated there)
+        self._session = _http_session(base)
+        self._raw_body_kw = "data" if isinstance(self._session, requests.Session) else "content"
         # Attempt to discover local peerId to use for Store queries
         self.peer_id: Optional[str] = None
         try:
-            info_url = f"{self.rpc_url.rstrip('/')}/debug/v1/info"
-            r = requests.get(info_url, timeout=self.timeout)
-            if r.ok:
-                data = r.json()
+            r = self._session.get(self._info_url, timeout=self.timeout)
+            if r.status_code < 400:
+                data = orjson.loads(r.content)
                 addrs = data.get("listenAddresses") or []
                 if addrs:
                     first = str(addrs[0])
@@ -32,12 +102,18 @@ class WakuClient:
         except Exception:
             self.peer_id = None
 
+    def close(self) -> None:
+        # Release pooled keep-alive connections
+        self._session.close()
+
     def _rpc(self, method: str, params: Any) -> Any:
         self._id += 1
-        payload = {"jsonrpc": "2.0", "id": self._id, "method": method, "params": params}
-        resp = requests.post(self.rpc_url, json=payload, timeout=self.timeout)
+        body = _rpc_body(method, self._id, params)
+        resp = self._session.post(
+            self.rpc_url, headers=_JSON_HEADERS, timeout=self.timeout, **{self._raw_body_kw: body}
+        )
         resp.raise_for_status()
-        body = resp.json()
+        body = orjson.loads(resp.content)
         if "error" in body:
             raise RuntimeError(body["error"])
         return body.get("result")
@@ -45,15 +121,14 @@ class WakuClient:
     # Relay publish: publish a message to a pubsub topic and content topic
     def relay_publish(self, pubsub_topic: str, content_topic: str, payload: bytes) -> str:
         # Publish via REST: /relay/v1/auto/messages expects base64 payload and contentTopic
-        url = f"{self.rpc_url.rstrip('/')}/relay/v1/auto/messages"
         body = {
-            "payload": base64.b64encode(payload).decode("ascii"),
+            "payload": binascii.b2a_base64(payload, newline=False).decode("ascii"),
             "contentTopic": content_topic,
         }
-        resp = requests.post(url, json=body, timeout=self.timeout)
+        resp = self._session.post(self._relay_url, json=body, timeout=self.timeout)
         resp.raise_for_status()
         try:
-            return resp.json()
+            return orjson.loads(resp.content)
         except Exception:
             return resp.text
 
@@ -81,20 +156,89 @@ class WakuClient:
         cursor: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         # Query via REST: /store/v1/messages with query parameters
-        url = f"{self.rpc_url.rstrip('/')}/store/v1/messages"
-        params: List[tuple] = [("contentTopics", t) for t in content_topics]
-        params.append(("pageSize", str(page_size)))
-        params.append(("ascending", "true"))
-        if pubsub_topic:
-            params.append(("pubsubTopic", pubsub_topic))
-        if self.peer_id:
-            params.append(("peerId", self.peer_id))
-        if start_time_ns is not None:
-            params.append(("startTime", str(start_time_ns)))
-        if end_time_ns is not None:
-            params.append(("endTime", str(end_time_ns)))
+        params = _store_params(content_topics, pubsub_topic, self.peer_id, start_time_ns, end_time_ns, page_size)
         # cursor support may vary; omit if not provided
         headers = {"Accept": "application/json"}
-        resp = requests.get(url, params=params, headers=headers, timeout=self.timeout)
+        resp = self._session.get(self._store_url, params=params, headers=headers, timeout=self.timeout)
         resp.raise_for_status()
-        return resp.json()
\ No newline at end of file
+        # Store pages can carry hundreds of messages; orjson parses them far faster than stdlib json
+        return orjson.loads(resp.content)
+
+
+class AsyncWakuClient:
+    """
+    aiohttp mirror of WakuClient for callers on an event loop.
+    All calls share one pooled keep-alive session, so concurrent store queries overlap
+    instead of queueing behind each other. The session is created on first use.
+    """
+
+    def __init__(self, rpc_url: Optional[str] = None, timeout: int = 10, peer_id: Optional[str] = None):
+        self.rpc_url = rpc_url or os.getenv("WAKU_NODE_URL", "http://localhost:8645")
+        # REST endpoint URLs are fixed per node; build them once
+        base = self.rpc_url.rstrip("/")
+        self._relay_url = f"{base}/relay/v1/auto/messages"
+        self._store_url = f"{base}/store/v1/messages"
+        self._id = 0
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        # Store peer; pass the one a sync WakuClient already discovered to skip the probe
+        self.peer_id = peer_id
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60),
+                timeout=self.timeout,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _rpc(self, method: str, params: Any) -> Any:
+        self._id += 1
+        body = _rpc_body(method, self._id, params)
+        async with self._get_session().post(self.rpc_url, data=body, headers=_JSON_HEADERS) as resp:
+            resp.raise_for_status()
+            body = orjson.loads(await resp.read())
+        if "error" in body:
+            raise RuntimeError(body["error"])
+        return body.get("result")
+
+    async def relay_publish(self, pubsub_topic: str, content_topic: str, payload: bytes) -> Any:
+        body = {
+            "payload": binascii.b2a_base64(payload, newline=False).decode("ascii"),
+            "contentTopic": content_topic,
+        }
+        async with self._get_session().post(self._relay_url, json=body) as resp:
+            resp.raise_for_status()
+            raw = await resp.read()
+        try:
+            return orjson.loads(raw)
+        except Exception:
+            return raw.decode("utf-8", "replace")
+
+    async def filter_subscribe(self, content_topics: List[str], pubsub_topic: Optional[str] = None) -> str:
+        return f"rest:{','.join(content_topics)}"
+
+    async def filter_unsubscribe(self, subscription_id: str) -> bool:
+        return True
+
+    async def filter_get_messages(self, subscription_id: str) -> List[Dict[str, Any]]:
+        return []
+
+    async def store_query(
+        self,
+        content_topics: List[str],
+        pubsub_topic: Optional[str] = None,
+        start_time_ns: Optional[int] = None,
+        end_time_ns: Optional[int] = None,
+        page_size: int = 50,
+        cursor: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        params = _store_params(content_topics, pubsub_topic, self.peer_id, start_time_ns, end_time_ns, page_size)
+        async with self._get_session().get(self._store_url, params=params, headers={"Accept": "application/json"}) as resp:
+            resp.raise_for_status()
+            return orjson.loads(await resp.read())
@@ -1,14 +1,27 @@
+import atexit
+import functools
 import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+from eth_abi import decode
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
 from web3 import Web3
+from log_poller import ESPACE_RPC_URL, make_session, make_web3, poll_logs
 
-ESPACE_RPC_URL = os.getenv("ESPACE_RPC_URL", "http://conflux:8545")
 MARKETPLACE_ADDRESS = os.getenv("MARKETPLACE_ADDRESS")
 MARKETPLACE_ADDRESS_FILE = os.getenv("MARKETPLACE_ADDRESS_FILE", "hardhat/marketplace_address.txt")
 ARTIFACT_PATH = os.getenv("ARTIFACT_PATH", "hardhat/artifacts/contracts/Marketplace.sol/Marketplace.json")
 OUT_PATH = os.getenv("OUT_PATH", "marketplace_events.jsonl")
 
+# Catch-up windows wider than this are split and fetched concurrently
+CHUNK = 512
+FETCH_WORKERS = 4
+# Non-indexed Listed fields (price, uri, contentHash); id and seller/buyer are topics 1 and 2
+LISTED_ABI_TYPES = ("uint256", "string", "bytes32")
+
 
 def wait_for_address(max_tries: int = 60, sleep_sec: float = 2.0):
     # Try env var first
@@ -20,91 +33,161 @@ def wait_for_address(max_tries: int = 60, sleep_sec: float = 2.0):
     # Then try file with retries
     tries = 0
     while tries < max_tries:
-        if os.path.exists(MARKETPLACE_ADDRESS_FILE):
-            try:
-                with open(MARKETPLACE_ADDRESS_FILE, "r") as f:
-                    addr = f.read().strip()
-                    if addr:
-                        return Web3.to_checksum_address(addr)
-            except Exception:
-                pass
+        # Open directly (no exists() check): a missing file is just another not-ready case
+        try:
+            with open(MARKETPLACE_ADDRESS_FILE, "r") as f:
+                addr = f.read().strip()
+            if addr:
+                return Web3.to_checksum_address(addr)
+        except Exception:
+            pass
         print(f"Waiting for marketplace address at {MARKETPLACE_ADDRESS_FILE} (attempt {tries+1}/{max_tries})")
         time.sleep(sleep_sec)
         tries += 1
     raise SystemExit("Set MARKETPLACE_ADDRESS or ensure MARKETPLACE_ADDRESS_FILE exists with a valid address")
 
 
+@functools.lru_cache(maxsize=1)
 def load_abi():
-    if not os.path.exists(ARTIFACT_PATH):
+    # The Hardhat artifact carries bytecode and metadata besides the ABI; parse the raw
+    # bytes with orjson and keep only the ABI
+    try:
+        with open(ARTIFACT_PATH, "rb") as f:
+            artifact = orjson.loads(f.read())
+    except FileNotFoundError:
         raise SystemExit(f"Artifact not found: {ARTIFACT_PATH}. Compile and deploy first.")
-    with open(ARTIFACT_PATH, "r") as f:
-        artifact = json.load(f)
     return artifact["abi"]
 
 
-def append_jsonl(record):
-    with open(OUT_PATH, "a") as f:
-        f.write(json.dumps(record) + "\n")
+def jsonl_line(record):
+    try:
+        return orjson.dumps(record)
+    except TypeError:
+        # orjson stops at 64-bit ints; uint256 prices above ~18.4 CFX need stdlib json
+        return json.dumps(record, separators=(",", ":")).encode()
+
+
+def append_jsonl(out, records):
+    # One buffered write per batch; main() flushes once per poll instead of reopening the file
+    out.write(b"\n".join([jsonl_line(r) for r in records]) + b"\n")
+
+
+def format_log(raw):
+    # The fields handle() reads, typed the way w3.eth.get_logs returns them
+    return {
+        "blockNumber": int(raw["blockNumber"], 16),
+        "logIndex": int(raw["logIndex"], 16),
+        "transactionHash": HexBytes(raw["transactionHash"]),
+        "topics": [HexBytes(t) for t in raw["topics"]],
+        "data": HexBytes(raw["data"]),
+    }
+
+
+def poll_batch(session, query, from_block, to_block):
+    # eth_blockNumber and eth_getLogs as one JSON-RPC batch: one HTTP round trip per poll.
+    # Returns (tip, logs up to the tip), or (tip, None) when only the getLogs entry failed.
+    body = orjson.dumps([
+        {"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []},
+        {"jsonrpc": "2.0", "id": 2, "method": "eth_getLogs",
+         "params": [{**query, "fromBlock": hex(from_block), "toBlock": hex(to_block)}]},
+    ])
+    resp = session.post(ESPACE_RPC_URL, data=body, headers={"Content-Type": "application/json"}, timeout=10)
+    resp.raise_for_status()
+    replies = orjson.loads(resp.content)
+    if not isinstance(replies, list):
+        raise ValueError(f"batch request not supported: {replies}")
+    by_id = {r.get("id"): r for r in replies}
+    tip = int(by_id[1]["result"], 16)
+    if "result" not in by_id[2]:
+        return tip, None
+    # The node may answer getLogs from a newer head than it reported; keep the two consistent
+    logs = [format_log(raw) for raw in by_id[2]["result"]]
+    return tip, [log for log in logs if log["blockNumber"] <= tip]
+
+
+def fetch_logs(w3, pool, query, from_block, to_block):
+    if to_block - from_block <= CHUNK:
+        return w3.eth.get_logs({**query, "fromBlock": from_block, "toBlock": to_block})
+    ranges = [(b, min(b + CHUNK - 1, to_block)) for b in range(from_block, to_block + 1, CHUNK)]
+    parts = pool.map(lambda r: w3.eth.get_logs({**query, "fromBlock": r[0], "toBlock": r[1]}), ranges)
+    # map() yields in submission order and each part is sorted by (blockNumber, logIndex),
+    # so concatenating the disjoint ranges keeps the whole batch in chain order
+    return [log for part in parts for log in part]
 
 
 def main():
     addr = wait_for_address()
     abi = load_abi()
+    out = open(OUT_PATH, "ab", buffering=1 << 16)
+    atexit.register(out.close)
 
-    w3 = Web3(Web3.HTTPProvider(ESPACE_RPC_URL))
+    session = make_session()
+    w3 = make_web3(session)
     if not w3.is_connected():
         raise SystemExit(f"Cannot connect to {ESPACE_RPC_URL}")
 
-    contract = w3.eth.contract(address=addr, abi=abi)
-    ev_listed = contract.events.Listed
-    ev_purchased = contract.events.Purchased
+    # topic0 hashes straight from the event ABIs, once; no contract/filter-builder objects.
+    # Both events come from one contract, so one eth_getLogs with a topic0 union covers them
+    events = {item["name"]: item for item in abi if item.get("type") == "event"}
+    listed_topic0 = HexBytes(event_abi_to_log_topic(events["Listed"]))
+    purchased_topic0 = HexBytes(event_abi_to_log_topic(events["Purchased"]))
+    logs_query = {"address": addr, "topics": [[listed_topic0.to_0x_hex(), purchased_topic0.to_0x_hex()]]}
+    pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
 
     # Start from current tip; change to a lower block to backfill history
     from_block = w3.eth.block_number
     print(f"Listening Marketplace at {addr} from block {from_block} on {ESPACE_RPC_URL}")
 
-    while True:
-        try:
-            to_block = w3.eth.block_number
-            if to_block >= from_block:
-                # Fetch both events in the block range (snake_case for web3.py v7)
-                listed_logs = ev_listed().get_logs(from_block=from_block, to_block=to_block)
-                purchased_logs = ev_purchased().get_logs(from_block=from_block, to_block=to_block)
-
-                for log in listed_logs:
-                    rec = {
-                        "type": "Listed",
-                        "blockNumber": log.blockNumber,
-                        "txHash": log.transactionHash.hex(),
-                        "id": log.args.id.hex() if hasattr(log.args.id, "hex") else str(log.args.id),
-                        "seller": log.args.seller,
-                        "price": int(log.args.price),
-                        "uri": log.args.uri,
-                        "contentHash": log.args.contentHash.hex() if hasattr(log.args.contentHash, "hex") else str(log.args.contentHash),
-                    }
-                    append_jsonl(rec)
-                    print(f"Listed: {rec}")
-
-                for log in purchased_logs:
-                    rec = {
-                        "type": "Purchased",
-                        "blockNumber": log.blockNumber,
-                        "txHash": log.transactionHash.hex(),
-                        "id": log.args.id.hex() if hasattr(log.args.id, "hex") else str(log.args.id),
-                        "buyer": log.args.buyer,
-                        "price": int(log.args.price),
-                    }
-                    append_jsonl(rec)
-                    print(f"Purchased: {rec}")
-
-                from_block = to_block + 1
-            time.sleep(2)
-        except KeyboardInterrupt:
-            print("Stopped by user")
-            break
-        except Exception as e:
-            print(f"Error: {e}")
-            time.sleep(5)
+    def handle(logs):
+        if not logs:
+            return
+        # Both layouts are fixed, so decode topics and data directly instead of through
+        # web3's per-log ABI decoding. Fields common to both events are pulled out
+        # column by column, then records are assembled from the columns in one pass.
+        topics = [raw["topics"] for raw in logs]
+        datas = [raw["data"] for raw in logs]
+        block_numbers = [raw["blockNumber"] for raw in logs]
+        tx_hashes = [raw["transactionHash"].hex() for raw in logs]
+        ids = [t[1].hex() for t in topics]
+        parties = [Web3.to_checksum_address(t[2][12:]) for t in topics]
+        records = [None] * len(logs)
+        for i, t in enumerate(topics):
+            if t[0] == listed_topic0:
+                price, uri, content_hash = decode(LISTED_ABI_TYPES, datas[i])
+                records[i] = {
+                    "type": "Listed",
+                    "blockNumber": block_numbers[i],
+                    "txHash": tx_hashes[i],
+                    "id": ids[i],
+                    "seller": parties[i],
+                    "price": price,
+                    "uri": uri,
+                    "contentHash": content_hash.hex(),
+                }
+            else:
+                records[i] = {
+                    "type": "Purchased",
+                    "blockNumber": block_numbers[i],
+                    "txHash": tx_hashes[i],
+                    "id": ids[i],
+                    "buyer": parties[i],
+                    "price": int.from_bytes(datas[i][:32], "big"),
+                }
+        append_jsonl(out, records)
+        out.flush()
+        for rec in records:
+            print(f"{rec['type']}: {rec}")
+
+    poll_logs(
+        w3,
+        from_block,
+        handle,
+        # Both events share one query; wide backfill windows fan out over the pool
+        get_logs=lambda a, b: fetch_logs(w3, pool, logs_query, a, b),
+        create_filter=lambda: w3.eth.filter(logs_query),
+        poll_batch=lambda a, b: poll_batch(session, logs_query, a, b),
+        batch_window=CHUNK,
+    )
 
 
 if __name__ == "__main__":
@@ -1,9 +1,8 @@
-import json
 import os
-import time
+import orjson
 from web3 import Web3
+from log_poller import ESPACE_RPC_URL, make_session, make_web3, poll_logs
 
-ESPACE_RPC_URL = os.getenv("ESPACE_RPC_URL", "http://conflux:8545")
 REGISTRY_ADDRESS = os.getenv("REGISTRY_ADDRESS")  # 0x... address on eSpace
 OUT_PATH = os.getenv("OUT_PATH", "registered_events.jsonl")
 
@@ -25,7 +24,7 @@ def main():
     if not REGISTRY_ADDRESS:
         raise SystemExit("Set REGISTRY_ADDRESS=0x... for IdentityRegistry on eSpace")
 
-    w3 = Web3(Web3.HTTPProvider(ESPACE_RPC_URL))
+    w3 = make_web3(make_session())
     if not w3.is_connected():
         raise SystemExit(f"Cannot connect to {ESPACE_RPC_URL}")
 
@@ -33,36 +32,38 @@ def main():
     event = contract.events.Registered
 
     # Start from latest to avoid historical catch-up; adjust if you want history
-    latest = w3.eth.block_number
-    from_block = latest
+    from_block = w3.eth.block_number
 
     print(f"Listening from block {from_block} on {ESPACE_RPC_URL} for {REGISTRY_ADDRESS}")
-    while True:
-        try:
-            to_block = w3.eth.block_number
-            if to_block >= from_block:
-                logs = event().get_logs(from_block=from_block, to_block=to_block)
-                if logs:
-                    with open(OUT_PATH, "a") as f:
-                        for log in logs:
-                            rec = {
-                                "blockNumber": log.blockNumber,
-                                "txHash": log.transactionHash.hex(),
-                                "owner": log.args.owner,
-                                "agentId": log.args.agentId,
-                                "metadata": log.args.metadata,
-                                "updatedAt": int(log.args.updatedAt),
-                            }
-                            f.write(json.dumps(rec) + "\n")
-                            print(f"Registered event: {rec}")
-                from_block = to_block + 1
-            time.sleep(2)
-        except KeyboardInterrupt:
-            print("Stopped by user")
-            break
-        except Exception as e:
-            print(f"Error: {e}")
-            time.sleep(5)
+
+    def handle(logs):
+        if not logs:
+            return
+        # Serialize the whole batch first, then append it with a single write
+        buf = bytearray()
+        for log in logs:
+            rec = {
+                "blockNumber": log.blockNumber,
+                "txHash": log.transactionHash.hex(),
+                "owner": log.args.owner,
+                "agentId": log.args.agentId,
+                "metadata": log.args.metadata,
+                "updatedAt": int(log.args.updatedAt),
+            }
+            buf += orjson.dumps(rec)
+            buf += b"\n"
+            print(f"Registered event: {rec}")
+        with open(OUT_PATH, "ab") as f:
+            f.write(buf)
+
+    poll_logs(
+        w3,
+        from_block,
+        handle,
+        get_logs=lambda a, b: event().get_logs(from_block=a, to_block=b),
+        create_filter=lambda: event().create_filter(from_block="latest"),
+    )
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,144 @@
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from web3 import Web3
+
+# Polling machinery shared by the eSpace indexers; each script supplies only how to
+# fetch, filter and record its own events.
+
+ESPACE_RPC_URL = os.getenv("ESPACE_RPC_URL", "http://conflux:8545")
+
+# Adaptive eth_getLogs window: grows 25% per successful query, halves when one fails
+MIN_RANGE = 16
+MAX_RANGE = 4096
+# Expected seconds per eSpace block; without a log filter the tip is re-read at most
+# twice per block, and catch-up windows reuse the cached tip
+BLOCK_TIME = float(os.getenv("BLOCK_TIME", "1.0"))
+TIP_POLL_INTERVAL = BLOCK_TIME / 2
+FILTER_POLL_INTERVAL = 2
+
+
+def make_session():
+    # One keep-alive session for the whole polling loop. Only connection failures are
+    # retried: urllib3 never replays a POST that reached the node, and
+    # eth_getFilterChanges is not safe to replay.
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=Retry(total=3, backoff_factor=0.2))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def make_web3(session):
+    provider = Web3.HTTPProvider(ESPACE_RPC_URL, session=session, request_kwargs={"timeout": 10})
+    return Web3(provider)
+
+
+def poll_logs(w3, from_block, handle, get_logs, create_filter, poll_batch=None, batch_window=512):
+    # Runs until interrupted, passing each batch of new logs (in chain order) to handle().
+    #   get_logs(from_block, to_block) -> logs   catch-up and fallback range scan
+    #   create_filter() -> web3 LogFilter        node-side filter starting at the head
+    #   poll_batch(from_block, to_block) -> (tip, logs or None)
+    #       optional single-round-trip tip + logs read, used when caught up without a filter
+    #
+    # Once caught up, a node-side log filter returns only new matches, so steady-state
+    # polling is one eth_getFilterChanges instead of eth_blockNumber + eth_getLogs.
+    # get_logs stays as the catch-up path and the fallback for nodes without filters.
+    latest = from_block - 1
+    max_range = 2048
+    log_filter = None
+    use_filter = True
+    use_batch = poll_batch is not None
+    caught_up = False
+    tip_checked_at = 0.0
+    # The batch always carries an eth_getLogs, so it is only sent when a new block is
+    # plausible: a block time after the tip last moved, and not again after a batch that
+    # found nothing until a bare eth_blockNumber sees the tip move
+    tip_moved_at = 0.0
+    batch_armed = True
+    while True:
+        try:
+            if use_filter and log_filter is None:
+                # Installed before the catch-up tip is read, so no block falls between the two
+                try:
+                    log_filter = create_filter()
+                except Exception as e:
+                    use_filter = False
+                    print(f"Log filters unavailable ({e}); polling with get_logs")
+            if log_filter is not None and caught_up:
+                try:
+                    logs = log_filter.get_new_entries()
+                except Exception as e:
+                    # Filters expire on node restart or inactivity: reinstall and catch up from from_block
+                    print(f"Log filter lost ({e}); recreating")
+                    log_filter = None
+                    caught_up = False
+                    tip_checked_at = 0.0
+                    continue
+                # Blocks below from_block were already covered by the get_logs catch-up
+                logs = [log for log in logs if log["blockNumber"] >= from_block]
+                handle(logs)
+                if logs:
+                    from_block = max(log["blockNumber"] for log in logs) + 1
+                time.sleep(FILTER_POLL_INTERVAL)
+                continue
+
+            now = time.monotonic()
+            if now - tip_checked_at >= TIP_POLL_INTERVAL:
+                tip_checked_at = now
+                prev_tip = latest
+                if use_batch and caught_up and batch_armed and now - tip_moved_at >= BLOCK_TIME:
+                    # Caught up without a filter: tip and the next window's logs in one round trip
+                    try:
+                        latest, logs = poll_batch(from_block, from_block + batch_window - 1)
+                    except Exception as e:
+                        use_batch = False
+                        print(f"JSON-RPC batch unavailable ({e}); polling with separate calls")
+                        latest = w3.eth.block_number
+                    else:
+                        batch_armed = latest > prev_tip
+                        if batch_armed:
+                            tip_moved_at = now
+                        # On a getLogs error fall through: the get_logs path below retries and adapts
+                        if logs is not None:
+                            if latest >= from_block:
+                                handle(logs)
+                                from_block = min(latest, from_block + batch_window - 1) + 1
+                            if from_block > latest:
+                                time.sleep(TIP_POLL_INTERVAL)
+                            continue
+                else:
+                    latest = w3.eth.block_number
+                if latest > prev_tip:
+                    tip_moved_at = now
+                    batch_armed = True
+            to_block = latest
+            if to_block >= from_block:
+                # Bound the window so catch-up after a stall can't produce one huge, timing-out query
+                to_block = min(latest, from_block + max_range - 1)
+                try:
+                    logs = get_logs(from_block, to_block)
+                except Exception as e:
+                    if max_range <= MIN_RANGE:
+                        raise
+                    max_range = max(MIN_RANGE, max_range // 2)
+                    print(f"get_logs failed ({e}); retrying with range {max_range}")
+                    continue
+                max_range = min(MAX_RANGE, int(max_range * 1.25))
+                handle(logs)
+                from_block = to_block + 1
+            # Still catching up: go straight to the next window
+            if to_block < latest:
+                continue
+            caught_up = True
+            # No get_logs runs until the tip moves past from_block, so waiting here
+            # costs at most one eth_blockNumber per interval
+            time.sleep(TIP_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            print("Stopped by user")
+            break
+        except Exception as e:
+            print(f"Error: {e}")
+            time.sleep(5)